@@ -1,9 +1,10 @@
-from typing import Any, List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
 from agno.db.sqlite import SqliteDb
 from agno.models.message import Message
 from pydantic import BaseModel
 from config.settings import settings
+from config.database import register_sqlite_pragmas
 from config.enum.llm_provider import LLMProvider
 from config.enum.framework import Framework
 
@@ -36,6 +37,22 @@ class AgentConfig:
         self.tools = tools or []
 
 
+# One agno SqliteDb per database file, shared by every agent run so its
+# engine, connection pool and page caches live for the whole process
+_DB_REGISTRY: Dict[str, SqliteDb] = {}
+
+
+def _get_agent_db(db_file: str) -> SqliteDb:
+    agent_db = _DB_REGISTRY.get(db_file)
+    if agent_db is None:
+        agent_db = SqliteDb(db_file=db_file)
+        # agno only switches its engine to WAL; add the app's per-connection
+        # PRAGMAs (synchronous, busy_timeout, caches) on top
+        register_sqlite_pragmas(agent_db.db_engine)
+        agent_db = _DB_REGISTRY.setdefault(db_file, agent_db)
+    return agent_db
+
+
 class BaseAgent:
     def __init__(self, config: AgentConfig):
         self.config = config
@@ -68,7 +85,7 @@ class BaseAgent:
         agent = Agent(
             name=self.config.name,
             model=model,
-            db=SqliteDb(db_file=self.config.db_file),
+            db=_get_agent_db(self.config.db_file),
             debug_mode=self.config.debug_mode,
             add_history_to_context=True,
             markdown=True,
@@ -35,6 +35,11 @@ class DatabaseFoodMatch:
         return f"{self.name} (score={self.score:.2f}, index={self.index})"
 
 
+# Food names per database path. food_items is seed data, so the list is read
+# once per process instead of on every (per-food) search call.
+_food_names_cache: dict[str, list[str]] = {}
+
+
 async def get_all_food_names(db_path: Path | str = DB_PATH) -> list[str]:
     """Fetch all food item names from the local SQLite database."""
     async with aiosqlite.connect(db_path) as db:
@@ -43,6 +48,15 @@ async def get_all_food_names(db_path: Path | str = DB_PATH) -> list[str]:
     return [row[0] for row in rows]
 
 
+async def get_cached_food_names(db_path: Path | str = DB_PATH) -> list[str]:
+    """Return all food names, loading them from the database on first use."""
+    key = str(db_path)
+    names = _food_names_cache.get(key)
+    if names is None:
+        names = _food_names_cache[key] = await get_all_food_names(db_path)
+    return names
+
+
 async def search_food_in_db(
     query: str,
     *,
@@ -68,7 +82,7 @@ async def search_food_in_db(
     if not db_path or db_path == "":
         db_path = DB_PATH
 
-    all_names = await get_all_food_names(db_path)
+    all_names = await get_cached_food_names(db_path)
 
     # `score_cutoff` expects 0-100 range whereas our threshold is 0.0-1.0.
     raw_results: Iterable[tuple[str, float, int]] = process.extract(
@@ -88,4 +102,9 @@ async def search_food_in_db(
     return result
 
 
-__all__ = ["DatabaseFoodMatch", "get_all_food_names", "search_food_in_db"]
+__all__ = [
+    "DatabaseFoodMatch",
+    "get_all_food_names",
+    "get_cached_food_names",
+    "search_food_in_db",
+]
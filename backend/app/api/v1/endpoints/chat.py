@@ -1,7 +1,7 @@
 """Chat endpoint for main user interaction."""
 
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 
 from usecase.main_workflow import MainWorkflow
 from models.session import SessionState
@@ -13,15 +13,18 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-def _determine_next_actions(session_state: SessionState) -> list[str]:
+# Suggested next actions per state, built once at import
+_NEXT_ACTIONS: dict[SessionState, tuple[str, ...]] = {
+    SessionState.INITIAL: ("start_tracking",),
+    SessionState.CLARIFYING: ("provide_clarification",),
+    SessionState.ADVISING: ("wait_for_analysis",),
+    SessionState.ADVISED: ("view_summary", "add_more_food", "reset"),
+}
+
+
+def _determine_next_actions(session_state: SessionState) -> tuple[str, ...]:
     """Determine suggested next actions based on session state."""
-    actions = {
-        SessionState.INITIAL: ["start_tracking"],
-        SessionState.CLARIFYING: ["provide_clarification"],
-        SessionState.ADVISING: ["wait_for_analysis"],
-        SessionState.ADVISED: ["view_summary", "add_more_food", "reset"],
-    }
-    return actions.get(session_state, [])
+    return _NEXT_ACTIONS.get(session_state, ())
 
 
 @router.post(
@@ -82,7 +85,11 @@ async def chat_endpoint(
             f"""Chat request processed successfully. Initial state: {session_state.value}
             Final state: {response.session_state.value}"""
         )
-        return response
+        # Serialize with pydantic's JSON encoder directly instead of letting
+        # FastAPI re-validate and walk the payload through jsonable_encoder
+        return Response(
+            content=response.model_dump_json(), media_type="application/json"
+        )
 
     except Exception as e:
         logger.error(f"Error processing chat request: {str(e)}", exc_info=True)
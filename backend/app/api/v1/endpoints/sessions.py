@@ -55,7 +55,7 @@ async def get_session_info(
             )
 
         # Parse session state
-        state_str = session_info.get("current_state", "initial")
+        state_str = session_info.get("current_state") or "initial"
         try:
             current_state = SessionState(state_str.lower())
         except ValueError:
@@ -111,7 +111,9 @@ async def get_session_state(
     try:
         logger.info(f"Fetching session state for: {session_id}")
 
-        state_data = workflow.get_session_state(session_id)
+        # Projection of the state and timestamps only; the session's full
+        # data is neither loaded nor created
+        state_data = workflow.get_session_summary(session_id)
 
         if not state_data:
             raise HTTPException(
@@ -120,7 +122,7 @@ async def get_session_state(
             )
 
         # Parse session state
-        state_str = state_data.get("current_state", "initial")
+        state_str = state_data.get("current_state") or "initial"
         try:
             current_state = SessionState(state_str.lower())
         except ValueError:
@@ -267,7 +269,7 @@ async def list_sessions(
         # Convert to response format
         session_items = []
         for session_data in sessions_data:
-            state_str = session_data.get("current_state", "initial")
+            state_str = session_data.get("current_state") or "initial"
             try:
                 current_state = SessionState(state_str.lower())
             except ValueError:
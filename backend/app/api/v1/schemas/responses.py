@@ -1,6 +1,6 @@
 """Response schemas for API endpoints."""
 
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Union
 from pydantic import BaseModel, Field
 from models.session import SessionState
 
@@ -55,7 +55,7 @@ class SessionInfoResponse(BaseModel):
     extracted_foods: List[Any] = Field(default_factory=list)
     pending_clarifications: List[Any] = Field(default_factory=list)
     has_analysis: bool = False
-    advisor_recommendations: Optional[Dict[str, Any]] = None
+    advisor_recommendations: Optional[Union[Dict[str, Any], str]] = None
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
 
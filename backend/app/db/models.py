@@ -1,6 +1,7 @@
 """SQLAlchemy models for database tables."""
 
 from sqlalchemy import Column, Integer, String, Float, Text, DateTime
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from config.database import Base
 
@@ -48,9 +49,12 @@ class AppSession(Base):
 
     __tablename__ = "app_sessions"
 
-    session_id = Column(String, primary_key=True, index=True)
+    # The primary key is already indexed; a second index only slows writes
+    session_id = Column(String, primary_key=True)
     session_type = Column(String, nullable=True)
     session_data = Column(Text, nullable=True)  # JSON stored as TEXT
+    # Advisor output kept apart from the per-turn state and loaded on demand
+    advice_data = deferred(Column(Text, nullable=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
         DateTime(timezone=True), onupdate=func.now(), server_default=func.now()
@@ -1,8 +1,9 @@
 """Database configuration and session management using SQLAlchemy."""
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine, event, inspect, make_url, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import QueuePool, StaticPool
 from typing import Generator
 import os
 
@@ -25,16 +26,71 @@ else:
 
 # Create SQLAlchemy engine
 # For SQLite, we need to enable check_same_thread=False to work with async/threading
+# and keep a larger per-connection prepared statement cache (default is 128)
 engine_kwargs = {}
 if DATABASE_URL.startswith("sqlite"):
-    engine_kwargs["connect_args"] = {"check_same_thread": False}
-    engine_kwargs["pool_pre_ping"] = True
+    engine_kwargs["connect_args"] = {
+        "check_same_thread": False,
+        "cached_statements": 256,
+    }
+    if make_url(DATABASE_URL).database in (None, "", ":memory:"):
+        # Every connection to :memory: opens its own empty database, so all
+        # threads share the single connection that holds the tables
+        engine_kwargs["poolclass"] = StaticPool
+    else:
+        # Keep a bounded set of open connections so requests reuse them
+        # instead of reopening the file (and its -wal/-shm) each time. No
+        # pre-ping: a local file connection cannot drop, so it would only
+        # add a SELECT 1 to every checkout.
+        engine_kwargs["poolclass"] = QueuePool
+        engine_kwargs["pool_size"] = 8
+        engine_kwargs["max_overflow"] = 4
 else:
     engine_kwargs["pool_pre_ping"] = True
     engine_kwargs["pool_recycle"] = 3600
 
 engine = create_engine(DATABASE_URL, **engine_kwargs)
 
+# SQLite PRAGMAs applied to every new connection. WAL lets readers proceed
+# while a session write commits, and synchronous=NORMAL makes a commit a log
+# append instead of an fsync; busy_timeout waits out a concurrent writer
+# instead of failing with "database is locked". Temp tables/indices stay in
+# memory, each connection keeps a ~20 MB page cache, and pages are read
+# through a memory map instead of read() copies.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA wal_autocheckpoint=1000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+    f"PRAGMA mmap_size={settings.db_mmap_mb * 1024 * 1024}",
+)
+
+
+def register_sqlite_pragmas(target_engine: Engine) -> None:
+    """Apply SQLITE_PRAGMAS to every new connection of a SQLite engine"""
+    if target_engine.dialect.name != "sqlite":
+        return
+
+    # An in-memory database cannot use WAL
+    in_memory = target_engine.url.database in (None, "", ":memory:")
+    pragmas = tuple(
+        pragma
+        for pragma in SQLITE_PRAGMAS
+        if not (in_memory and pragma.startswith("PRAGMA journal_mode"))
+    )
+
+    @event.listens_for(target_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+register_sqlite_pragmas(engine)
+
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -62,3 +118,29 @@ def init_db() -> None:
     Should be called on application startup.
     """
     Base.metadata.create_all(bind=engine)
+    _add_missing_session_columns()
+
+
+# Columns added to app_sessions after it was first created. create_all never
+# alters an existing table, so databases from before these columns existed
+# get them added here.
+_SESSION_COLUMNS_ADDED = (("advice_data", "TEXT"),)
+
+
+def _add_missing_session_columns() -> None:
+    """Add any _SESSION_COLUMNS_ADDED missing from an existing app_sessions"""
+    inspector = inspect(engine)
+    if not inspector.has_table("app_sessions"):
+        return
+    existing = {column["name"] for column in inspector.get_columns("app_sessions")}
+    missing = [
+        (name, ddl_type)
+        for name, ddl_type in _SESSION_COLUMNS_ADDED
+        if name not in existing
+    ]
+    if not missing:
+        return
+
+    with engine.begin() as conn:
+        for name, ddl_type in missing:
+            conn.execute(text(f"ALTER TABLE app_sessions ADD COLUMN {name} {ddl_type}"))
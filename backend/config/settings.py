@@ -30,6 +30,16 @@ class Settings(BaseSettings):
 
     # Database
     db_path: str = Field(..., description="Path to SQLite database")
+    db_mmap_mb: int = Field(
+        default=256,
+        ge=0,
+        description="SQLite memory-mapped I/O size in MB (0 disables)",
+    )
+    session_cache_size: int = Field(
+        default=1024,
+        ge=0,
+        description="Serialized session states kept in memory (0 disables)",
+    )
 
     # ========================================
     # FastAPI Configuration
@@ -16,6 +16,9 @@ class SQLiteDB:
         try:
             conn = sqlite3.connect(self.db_path)
             conn.execute("PRAGMA foreign_keys = ON;")
+            conn.execute("PRAGMA journal_mode = WAL;")
+            conn.execute("PRAGMA synchronous = NORMAL;")
+            conn.execute("PRAGMA busy_timeout = 5000;")
             return conn
         except sqlite3.Error as e:
             print(f"Error connecting to database: {e}")
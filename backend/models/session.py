@@ -1,4 +1,7 @@
 from enum import Enum
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field
 
 
 class SessionState(str, Enum):
@@ -8,3 +11,28 @@ class SessionState(str, Enum):
     CLARIFYING = "clarifying"  # Search food agent responding to user
     ADVISING = "advising"  # Search food agent forwarding to advisor agent
     ADVISED = "advised"  # Advisors sent to user
+
+
+class SessionData(BaseModel):
+    """Workflow state carried by a session between turns"""
+
+    current_state: str = Field(
+        SessionState.INITIAL.value, description="SessionState value"
+    )
+    extracted_foods: List[Dict[str, Any]] = Field(
+        default_factory=list, description="Foods from the last extraction"
+    )
+    pending_clarifications: List[Dict[str, Any]] = Field(
+        default_factory=list, description="Extracted foods awaiting clarification"
+    )
+    clarification_responses: Dict[str, str] = Field(
+        default_factory=dict, description="User answers to clarification prompts"
+    )
+    advisor_recommendations: Optional[Union[Dict[str, Any], str]] = Field(
+        None,
+        description="Latest advisor output (stored in its own column); plain "
+        "text for unstructured or legacy advice",
+    )
+    user_message: Optional[str] = Field(
+        None, description="Message the foods were extracted from"
+    )
@@ -2,7 +2,6 @@ from agents.nutrition_advisor import NutritionAdvisorAgent
 from models.food import FoodItem
 from typing import Dict, List, Any
 from pydantic import BaseModel, Field
-import json
 
 
 class DailyMealData(BaseModel):
@@ -111,28 +110,51 @@ def analyze_daily_nutrition(
         >>> for meal, nutrients in analysis.summary.meals_breakdown.items():
         ...     print(f"{meal}: {nutrients['calories']} kcal")
     """
-    # Validate input against firm schema
-    if isinstance(meal_data, dict):
-        validated_data = DailyMealData(**meal_data)
-    else:
-        validated_data = meal_data
-
     # Create the advisor agent
     agent = NutritionAdvisorAgent
 
-    # Convert to dict for JSON serialization
-    meal_dict = validated_data.model_dump(exclude_none=False)
+    # Get the complete analysis from AI as structured output
+    run_output = agent.run(
+        _build_prompt(meal_data), output_schema=DailyNutritionAnalysis
+    )
+    analysis: DailyNutritionAnalysis = run_output.content
+
+    return analysis
 
-    # Simple prompt - all instructions are in system_prompt
-    prompt = json.dumps(meal_dict, indent=2)
 
-    # Get the complete analysis from AI
-    run_output = agent.run(prompt)
+async def analyze_daily_nutrition_async(
+    meal_data: Dict[str, List[Dict[str, Any]]] | DailyMealData,
+) -> DailyNutritionAnalysis:
+    """
+    Async variant of analyze_daily_nutrition.
+
+    Awaits the advisor agent instead of blocking the event loop for the whole
+    LLM call, so other sessions keep being served meanwhile.
+    """
+    run_output = await NutritionAdvisorAgent.arun(
+        _build_prompt(meal_data), output_schema=DailyNutritionAnalysis
+    )
     analysis: DailyNutritionAnalysis = run_output.content
 
     return analysis
 
 
+def _build_prompt(
+    meal_data: Dict[str, List[Dict[str, Any]]] | DailyMealData,
+) -> str:
+    """Validate meal data and serialize it as the advisor prompt."""
+    # Validate input against firm schema
+    if isinstance(meal_data, dict):
+        validated_data = DailyMealData(**meal_data)
+    else:
+        validated_data = meal_data
+
+    # Simple prompt - all instructions are in system_prompt. Compact JSON
+    # straight from pydantic's serializer: no dict intermediate, and no
+    # indentation tokens for the LLM to prefill.
+    return validated_data.model_dump_json(exclude_none=False)
+
+
 # ============================================================================
 # TESTS
 # ============================================================================
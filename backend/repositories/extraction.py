@@ -1,10 +1,18 @@
+from functools import lru_cache
+
 from repositories.models.extraction import FoodExtractionResult
 from agents.food_extractor_agent import create_food_extractor_agent
 
 
+@lru_cache(maxsize=1)
+def _get_food_extractor_agent():
+    """Shared extractor agent; it only holds configuration"""
+    return create_food_extractor_agent()
+
+
 async def extract_foods_structured(message: str) -> FoodExtractionResult:
     """Extract foods with native structured output"""
-    agent = create_food_extractor_agent()
+    agent = _get_food_extractor_agent()
     run_output = await agent.arun(message, output_schema=FoodExtractionResult)
     return run_output.content
 
@@ -1,8 +1,109 @@
-from typing import Dict, Any, Optional
-import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple, Union
+from pydantic import ValidationError
+from pydantic_core import from_json, to_json
+from sqlalchemy import JSON, bindparam, case, select, type_coerce
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
 from app.db.models import AppSession
-from models.session import SessionState
+from config.settings import settings
+from models.session import SessionData, SessionState
+
+# Session state key persisted in its own (cold) column instead of session_data
+ADVICE_KEY = "advisor_recommendations"
+
+# Dialects whose INSERT supports ON CONFLICT ... DO UPDATE
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# Point lookups built once; values are bound per call
+_SELECT_SESSION_DATA = select(AppSession.session_data).where(
+    AppSession.session_id == bindparam("session_id")
+)
+_SELECT_ADVICE_DATA = select(AppSession.advice_data).where(
+    AppSession.session_id == bindparam("session_id")
+)
+
+
+def _current_state_column(dialect_name: str):
+    """session_data's current_state read in SQL, without loading the blob.
+
+    SQLite's JSON functions take the TEXT as is (a CAST would apply NUMERIC
+    affinity) and raise on malformed JSON, which would fail the whole query,
+    so invalid rows are guarded with json_valid. Rows without a readable
+    state (NULL, malformed or missing the key) report the initial state.
+    Other dialects can't guard a JSON cast portably; there the blob is
+    selected and parsed per row instead (see _current_state_from_blob).
+    """
+    if dialect_name != "sqlite":
+        return AppSession.session_data
+    state = type_coerce(AppSession.session_data, JSON)["current_state"].as_string()
+    return func.coalesce(
+        case((func.json_valid(AppSession.session_data) == 1, state)),
+        SessionState.INITIAL.value,
+    ).label("current_state")
+
+
+def _current_state_from_blob(session_data: Optional[str]) -> str:
+    """current_state from a raw session_data blob, initial if unreadable"""
+    try:
+        data = from_json(session_data) if session_data else None
+    except ValueError:
+        data = None
+    if isinstance(data, dict) and data.get("current_state"):
+        return data["current_state"]
+    return SessionState.INITIAL.value
+
+
+@lru_cache(maxsize=8)
+def _upsert_statement(dialect_name: str, columns: Tuple[str, ...]):
+    """Upsert for one dialect and column set; values are bound per call"""
+    stmt = _UPSERT_INSERTS[dialect_name](AppSession)
+    return stmt.on_conflict_do_update(
+        index_elements=[AppSession.session_id],
+        set_={
+            **{column: stmt.excluded[column] for column in columns},
+            "updated_at": func.now(),
+        },
+    )
+
+
+class _StateCache:
+    """Thread-safe LRU of serialized session_data keyed by session id"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[str]:
+        with self._lock:
+            session_data = self._data.get(session_id)
+            if session_data is not None:
+                self._data.move_to_end(session_id)
+            return session_data
+
+    def put(self, session_id: str, session_data: str) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[session_id] = session_data
+            self._data.move_to_end(session_id)
+            # Entries are write-through, so evicting never loses a save
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, session_id: str) -> None:
+        with self._lock:
+            self._data.pop(session_id, None)
+
+
+# Write-through cache of serialized session_data. It is module-level because a
+# repository is created per request, and it assumes a single server process
+# owns the database.
+_state_cache = _StateCache(settings.session_cache_size)
 
 
 class SessionRepository:
@@ -16,65 +117,179 @@ class SessionRepository:
             db: SQLAlchemy database session
         """
         self.db = db
+        # Serialized columns staged between begin() and commit(), keyed by id
+        self._staged: Optional[Dict[str, Dict[str, Optional[str]]]] = None
+
+    def begin(self) -> None:
+        """Start staging session saves until commit() or rollback()"""
+        self._staged = {}
+
+    def commit(self) -> bool:
+        """Write all staged session saves in a single transaction"""
+        staged, self._staged = self._staged, None
+        if staged:
+            # Drop saves that would rewrite the stored state unchanged
+            staged = {
+                session_id: columns
+                for session_id, columns in staged.items()
+                if "advice_data" in columns
+                or columns["session_data"] != _state_cache.get(session_id)
+            }
+        if not staged:
+            return True
 
-    def get_session_state(self, session_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            for session_id, columns in staged.items():
+                self._write_session_data(session_id, columns)
+            self.db.commit()
+            for session_id, columns in staged.items():
+                _state_cache.put(session_id, columns["session_data"])
+            return True
+        except Exception as e:
+            self.db.rollback()
+            for session_id in staged:
+                _state_cache.pop(session_id)
+            print(f"Error committing session states {list(staged)}: {e}")
+            return False
+
+    def release(self) -> None:
+        """Return the pooled connection until the next query; staged saves stay"""
+        self.db.rollback()
+
+    def rollback(self) -> None:
+        """Discard staged session saves"""
+        self._staged = None
+        self.db.rollback()
+
+    def get_session_state_blob(self, session_id: str) -> Optional[str]:
+        """Get the raw serialized session state, or None if missing"""
+        # Select only the data column so no ORM entity is materialized
+        return self.db.execute(
+            _SELECT_SESSION_DATA, {"session_id": session_id}
+        ).scalar()
+
+    def _load_session_state(self, session_id: str) -> Optional[SessionData]:
+        """Get session state, or None if missing; raises if it can't be parsed"""
+        if self._staged and session_id in self._staged:
+            session_data = self._staged[session_id]["session_data"]
+        else:
+            session_data = _state_cache.get(session_id)
+            if session_data is None:
+                session_data = self.get_session_state_blob(session_id)
+                if session_data:
+                    _state_cache.put(session_id, session_data)
+
+        if session_data:
+            return SessionData.model_validate_json(session_data)
+        return None
+
+    def get_session_state(self, session_id: str) -> Optional[SessionData]:
         """Get session state from database"""
-        session = (
+        try:
+            return self._load_session_state(session_id)
+        except ValidationError as e:
+            print(f"Error deserializing session state for {session_id}: {e}")
+            return None
+
+    def get_advisor_recommendations(
+        self, session_id: str
+    ) -> Optional[Union[Dict[str, Any], str]]:
+        """Get the stored advisor recommendations, loaded only on demand"""
+        if self._staged and "advice_data" in self._staged.get(session_id, {}):
+            advice_data = self._staged[session_id]["advice_data"]
+        else:
+            advice_data = self.db.execute(
+                _SELECT_ADVICE_DATA, {"session_id": session_id}
+            ).scalar()
+
+        if advice_data:
+            try:
+                return from_json(advice_data)
+            except ValueError as e:
+                print(f"Error deserializing advice for {session_id}: {e}")
+        return None
+
+    def _serialize_columns(self, state: SessionData) -> Dict[str, Optional[str]]:
+        """Split state into the per-turn session_data and the advice column.
+
+        The advice column is only included when the advice field was set or
+        cleared on this instance; states loaded from session_data never carry
+        it, so their saves leave the column as is.
+        """
+        columns = {"session_data": state.model_dump_json(exclude={ADVICE_KEY})}
+        if ADVICE_KEY in state.model_fields_set:
+            advice = state.advisor_recommendations
+            columns["advice_data"] = (
+                None if advice is None else to_json(advice).decode()
+            )
+        return columns
+
+    def _write_session_data(
+        self, session_id: str, columns: Dict[str, Optional[str]]
+    ) -> None:
+        """Insert or update the session row without committing.
+
+        Where the dialect supports it this is one upsert statement that only
+        touches the given columns (plus updated_at) on an existing row.
+        """
+        dialect_name = self.db.get_bind().dialect.name
+        if dialect_name in _UPSERT_INSERTS:
+            self.db.execute(
+                _upsert_statement(dialect_name, tuple(columns)),
+                {"session_id": session_id, "session_type": "workflow", **columns},
+            )
+            return
+
+        # Check if session exists
+        existing = (
             self.db.query(AppSession)
             .filter(AppSession.session_id == session_id)
             .first()
         )
 
-        if session and session.session_data:
-            try:
-                return json.loads(session.session_data)
-            except json.JSONDecodeError as e:
-                print(f"Error deserializing session state for {session_id}: {e}")
-                return None
-        return None
+        if existing:
+            # Update existing session
+            for column, value in columns.items():
+                setattr(existing, column, value)
+            existing.session_type = "workflow"
+        else:
+            # Create new session
+            new_session = AppSession(
+                session_id=session_id,
+                session_type="workflow",
+                **columns,
+            )
+            self.db.add(new_session)
 
-    def save_session_state(self, session_id: str, state: Dict[str, Any]) -> bool:
-        """Save or update session state in database"""
+    def save_session_state(self, session_id: str, state: SessionData) -> bool:
+        """Save or update session state in database.
+
+        Between begin() and commit() the save is only staged, so repeated
+        saves of a session coalesce into one write.
+        """
         try:
-            serialized_state = json.dumps(state)
+            columns = self._serialize_columns(state)
 
-            # Check if session exists
-            existing = (
-                self.db.query(AppSession)
-                .filter(AppSession.session_id == session_id)
-                .first()
-            )
-
-            if existing:
-                # Update existing session
-                existing.session_data = serialized_state
-                existing.session_type = "workflow"
-            else:
-                # Create new session
-                new_session = AppSession(
-                    session_id=session_id,
-                    session_type="workflow",
-                    session_data=serialized_state,
-                )
-                self.db.add(new_session)
+            if self._staged is not None:
+                self._staged.setdefault(session_id, {}).update(columns)
+                return True
 
+            self._write_session_data(session_id, columns)
             self.db.commit()
+            _state_cache.put(session_id, columns["session_data"])
             return True
         except Exception as e:
             self.db.rollback()
+            _state_cache.pop(session_id)
             print(f"Error saving session state for {session_id}: {e}")
             return False
 
-    def create_initial_session(self, session_id: str) -> Dict[str, Any]:
+    def create_initial_session(self, session_id: str) -> SessionData:
         """Create a new session with initial state"""
-        initial_state = {
-            "current_state": SessionState.INITIAL.value,
-            "extracted_foods": [],
-            "pending_clarifications": [],
-            "clarification_responses": {},
-            "advisor_recommendations": None,
-            "user_message": None,
-        }
+        # Advice is passed explicitly so a reset also clears the advice column
+        initial_state = SessionData(
+            current_state=SessionState.INITIAL.value, advisor_recommendations=None
+        )
 
         success = self.save_session_state(session_id, initial_state)
         if success:
@@ -82,9 +297,16 @@ class SessionRepository:
         else:
             raise Exception(f"Failed to create initial session for {session_id}")
 
-    def get_or_create_session(self, session_id: str) -> Dict[str, Any]:
-        """Get existing session or create new one if it doesn't exist"""
-        existing_state = self.get_session_state(session_id)
+    def get_or_create_session(self, session_id: str) -> SessionData:
+        """Get existing session or create new one if it doesn't exist.
+
+        A stored state that fails to parse is an error, not a missing
+        session; replacing it would silently discard the user's data.
+        """
+        try:
+            existing_state = self._load_session_state(session_id)
+        except ValidationError as e:
+            raise Exception(f"Unreadable session state for {session_id}") from e
 
         if existing_state is not None:
             return existing_state
@@ -102,59 +324,84 @@ class SessionRepository:
             if session:
                 self.db.delete(session)
                 self.db.commit()
+            _state_cache.pop(session_id)
             return True
         except Exception as e:
             self.db.rollback()
             print(f"Error deleting session {session_id}: {e}")
             return False
 
-    def reset_session(self, session_id: str) -> Dict[str, Any]:
+    def reset_session(self, session_id: str) -> SessionData:
         """Reset session to initial state"""
         return self.create_initial_session(session_id)
 
+    def _summary_query(self):
+        """Session id, current state and timestamps; on SQLite session_data stays in SQL"""
+        return select(
+            AppSession.session_id,
+            _current_state_column(self.db.get_bind().dialect.name),
+            AppSession.created_at,
+            AppSession.updated_at,
+        )
+
+    @staticmethod
+    def _summary_dict(row) -> Dict[str, Any]:
+        if "current_state" in row._fields:
+            current_state = row.current_state
+        else:
+            current_state = _current_state_from_blob(row.session_data)
+        return {
+            "session_id": row.session_id,
+            "current_state": current_state,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+        }
+
+    def get_session_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session's current state and timestamps without loading its data"""
+        row = self.db.execute(
+            self._summary_query().where(AppSession.session_id == session_id)
+        ).first()
+        return self._summary_dict(row) if row else None
+
     def list_sessions(self) -> list[Dict[str, Any]]:
         """List all sessions with basic info"""
         try:
-            sessions_query = (
-                self.db.query(AppSession).order_by(AppSession.updated_at.desc()).all()
+            rows = self.db.execute(
+                self._summary_query().order_by(AppSession.updated_at.desc())
             )
-
-            sessions = []
-            for session in sessions_query:
-                sessions.append(
-                    {
-                        "session_id": session.session_id,
-                        "created_at": session.created_at.isoformat()
-                        if session.created_at
-                        else None,
-                        "updated_at": session.updated_at.isoformat()
-                        if session.updated_at
-                        else None,
-                    }
-                )
-
-            return sessions
+            return [self._summary_dict(row) for row in rows]
         except Exception as e:
             print(f"Error listing sessions: {e}")
             return []
 
     def get_session_info(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session metadata and current state info"""
-        session = (
-            self.db.query(AppSession)
-            .filter(AppSession.session_id == session_id)
-            .first()
-        )
+        session = self.db.execute(
+            select(
+                AppSession.session_id,
+                AppSession.session_data,
+                AppSession.advice_data,
+                AppSession.created_at,
+                AppSession.updated_at,
+            ).where(AppSession.session_id == session_id)
+        ).first()
 
         if session and session.session_data:
             try:
-                state = json.loads(session.session_data)
+                state = SessionData.model_validate_json(session.session_data)
+                # Rows written before the advice column keep it in session_data
+                advice = (
+                    from_json(session.advice_data)
+                    if session.advice_data
+                    else state.advisor_recommendations
+                )
                 return {
                     "session_id": session.session_id,
-                    "current_state": state.get("current_state"),
-                    "extracted_foods": state.get("extracted_foods", []),
-                    "pending_clarifications": state.get("pending_clarifications", []),
-                    "advisor_recommendations": state.get("advisor_recommendations"),
+                    "current_state": state.current_state,
+                    "extracted_foods": state.extracted_foods,
+                    "pending_clarifications": state.pending_clarifications,
+                    "advisor_recommendations": advice,
                     "created_at": session.created_at.isoformat()
                     if session.created_at
                     else None,
@@ -162,6 +409,6 @@ class SessionRepository:
                     if session.updated_at
                     else None,
                 }
-            except json.JSONDecodeError:
+            except ValueError:  # includes ValidationError
                 return None
         return None
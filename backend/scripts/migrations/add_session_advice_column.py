@@ -0,0 +1,127 @@
+"""
+Migration script: Add advice_data column to app_sessions
+
+This script:
+1. Adds the advice_data column that stores advisor recommendations
+   separately from the per-turn session_data JSON
+2. Moves advisor_recommendations out of existing session_data into the
+   new column (safe to re-run; rows already moved are skipped)
+
+App startup (init_db) also adds the column if it is missing, but only this
+script moves the advice of existing sessions; until then it is still read
+from session_data.
+
+Run this script after updating the SQLAlchemy models.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from sqlalchemy import text
+from config.database import engine, init_db
+
+ADVICE_KEY = "advisor_recommendations"
+
+
+def check_column_exists(table_name: str, column_name: str) -> bool:
+    """Check if a column exists in the given table."""
+    with engine.connect() as conn:
+        result = conn.execute(text(f"PRAGMA table_info('{table_name}')"))
+        return any(row[1] == column_name for row in result.fetchall())
+
+
+def check_table_exists(table_name: str) -> bool:
+    """Check if a table exists in the database."""
+    with engine.connect() as conn:
+        result = conn.execute(
+            text(
+                f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'"
+            )
+        )
+        return result.fetchone() is not None
+
+
+def move_advice(conn) -> int:
+    """Move advisor_recommendations out of session_data into advice_data.
+
+    An advice_data value already present wins over the copy in session_data.
+    Rows whose session_data is not a JSON object are left untouched.
+    """
+    rows = conn.execute(
+        text("SELECT session_id, session_data, advice_data FROM app_sessions")
+    ).fetchall()
+
+    moved = 0
+    for session_id, session_data, advice_data in rows:
+        try:
+            data = json.loads(session_data) if session_data else None
+        except ValueError:
+            print(f"  [SKIP] {session_id}: session_data is not valid JSON")
+            continue
+        if not isinstance(data, dict) or ADVICE_KEY not in data:
+            continue
+
+        advice = data.pop(ADVICE_KEY)
+        if advice_data is None and advice is not None:
+            advice_data = json.dumps(advice)
+        conn.execute(
+            text(
+                "UPDATE app_sessions SET session_data = :session_data, "
+                "advice_data = :advice_data WHERE session_id = :session_id"
+            ),
+            {
+                "session_data": json.dumps(data),
+                "advice_data": advice_data,
+                "session_id": session_id,
+            },
+        )
+        moved += 1
+    return moved
+
+
+def migrate():
+    """Add advice_data column to app_sessions."""
+    print("=" * 80)
+    print("Database Migration: app_sessions.advice_data")
+    print("=" * 80)
+
+    # Fresh databases get the column from the model definition
+    if not check_table_exists("app_sessions"):
+        print("\n[OK] No migration needed - app_sessions table doesn't exist")
+        print("  Creating fresh app_sessions table...")
+        init_db()
+        print("[OK] app_sessions table created successfully")
+        return
+
+    column_exists = check_column_exists("app_sessions", "advice_data")
+
+    try:
+        with engine.begin() as conn:
+            if column_exists:
+                print("\n[OK] advice_data column already exists")
+            else:
+                print("\n[MIGRATING] Adding advice_data column...")
+                conn.execute(
+                    text("ALTER TABLE app_sessions ADD COLUMN advice_data TEXT")
+                )
+                print("[OK] Column added successfully")
+
+            print("\n[MIGRATING] Moving advisor recommendations to advice_data...")
+            moved = move_advice(conn)
+            print(f"[OK] Moved advice for {moved} session(s)")
+
+        print("\n[SUCCESS] Migration completed successfully!")
+        print("\n" + "=" * 80)
+
+    except Exception as e:
+        print(f"\n[ERROR] Migration failed: {e}")
+        print("\nPlease check the error and try again.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    migrate()
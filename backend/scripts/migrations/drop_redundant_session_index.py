@@ -0,0 +1,77 @@
+"""
+Migration script: Drop the redundant session_id index on app_sessions
+
+This script:
+1. Drops the plain index on app_sessions(session_id), which duplicated the
+   primary key index and had to be maintained on every session write. It is
+   found by its columns, not its name: databases that went through
+   migrate_sessions_table.py still call it ix_agno_sessions_session_id,
+   fresh ones ix_app_sessions_session_id
+2. Leaves all existing session data untouched
+
+Run this script after updating the SQLAlchemy models.
+"""
+
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from sqlalchemy import text
+from config.database import engine
+
+TABLE_NAME = "app_sessions"
+INDEXED_COLUMNS = ["session_id"]
+
+
+def find_redundant_indexes() -> list[str]:
+    """Names of CREATE INDEX indexes covering exactly app_sessions(session_id).
+
+    Primary key and UNIQUE constraint indexes (origin 'pk' / 'u') and partial
+    indexes are never returned.
+    """
+    with engine.connect() as conn:
+        indexes = conn.execute(text(f"PRAGMA index_list('{TABLE_NAME}')")).fetchall()
+        redundant = []
+        for _seq, name, _unique, origin, partial in indexes:
+            if origin != "c" or partial:
+                continue
+            columns = [
+                row[2] for row in conn.execute(text(f"PRAGMA index_info('{name}')"))
+            ]
+            if columns == INDEXED_COLUMNS:
+                redundant.append(name)
+        return redundant
+
+
+def migrate():
+    """Drop the redundant session_id index."""
+    print("=" * 80)
+    print(f"Database Migration: drop redundant {TABLE_NAME}.session_id index")
+    print("=" * 80)
+
+    index_names = find_redundant_indexes()
+    if not index_names:
+        print("\n[OK] No migration needed - no redundant session_id index exists")
+        print("  Skipping migration")
+        return
+
+    try:
+        with engine.begin() as conn:
+            for index_name in index_names:
+                print(f"\n[MIGRATING] Dropping {index_name}...")
+                conn.execute(text(f'DROP INDEX "{index_name}"'))
+                print("[OK] Index dropped successfully")
+
+        print("\n[SUCCESS] Migration completed successfully!")
+        print("\n" + "=" * 80)
+
+    except Exception as e:
+        print(f"\n[ERROR] Migration failed: {e}")
+        print("\nPlease check the error and try again.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    migrate()
@@ -1,96 +1,235 @@
-from typing import Optional, Dict, Any
+import asyncio
+import re
+import weakref
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Optional, Dict, Any, Union
 from dotenv import load_dotenv
-from models.extraction import FoodSearchPayload, FoodNames, FoodSearchResult
-from models.session import SessionState
-from models.food import FoodItem
+from models.extraction import FoodNames, FoodSearchPayload, FoodSearchResult
+from models.session import SessionData, SessionState
+from models.food import FoodItem, MealType
 from repositories.session import SessionRepository
 from repositories.extraction import extract_foods_structured
-from repositories.analyze_nutrition import analyze_daily_nutrition, DailyMealData
+from repositories.analyze_nutrition import (
+    analyze_daily_nutrition_async,
+    DailyMealData,
+    DailyNutritionAnalysis,
+)
 from agents.food_search_agent import create_food_search_agent
 from config.sqlite import SQLiteDB
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Keywords that signal a new food tracking request, matched in one regex scan.
+# Indonesian stems match anywhere in a word so affixed forms still count
+# ("makanan", "dimakan", "sarapannya"); English keywords match as whole words
+# (plurals allowed) so e.g. "ate" does not fire on "water" or "later". The
+# trade-off is that the Indonesian stems can still hit unrelated words that
+# contain them, as any substring match did before.
+_FOOD_STEMS = ("makan", "sarapan")
+_FOOD_WORDS = ("lunch", "dinner", "snack", "ate", "eating", "food")
+_FOOD_KEYWORDS_RE = re.compile(
+    r"(?:"
+    + "|".join(map(re.escape, _FOOD_STEMS))
+    + r")|\b(?:"
+    + "|".join(map(re.escape, _FOOD_WORDS))
+    + r")(?:e?s)?\b",
+    re.IGNORECASE,
+)
+
+# DailyMealData field for each meal type; anything else is counted as a snack
+_MEAL_KEY = {
+    MealType.BREAKFAST: "Breakfast",
+    MealType.LUNCH: "Lunch",
+    MealType.DINNER: "Dinner",
+    MealType.SNACK: "Snack",
+}
+
+# Advice message templates, parsed once instead of per formatted response and
+# filled through pre-bound format methods
+_TOTALS_TPL = (
+    "**Daily Totals:**\n"
+    "- Calories: {cal:.0f} kcal\n"
+    "- Protein: {p:.1f}g\n"
+    "- Carbohydrates: {c:.1f}g\n"
+    "- Fat: {f:.1f}g\n"
+    "- Fiber: {fib:.1f}g"
+)
+_SCORES_TPL = "**Scores:** macro balance {macro}/10, meal distribution {dist}/10"
+_format_totals = _TOTALS_TPL.format
+_format_scores = _SCORES_TPL.format
+
+
+def _bullets(title: str, items: list) -> str:
+    return "\n".join([f"**{title}:**", *(f"- {item}" for item in items)])
+
+
+def _format_nutrition_analysis(analysis: Union[DailyNutritionAnalysis, str]) -> str:
+    """Render the advisor output as the chat message text.
+
+    A plain-text reply (the model did not produce the structured schema) is
+    already the message and is returned as is.
+    """
+    if not isinstance(analysis, DailyNutritionAnalysis):
+        return str(analysis)
+    summary, advice = analysis.summary, analysis.advice
+    parts = [
+        _format_totals(
+            cal=summary.total_calories,
+            p=summary.total_protein,
+            c=summary.total_carbohydrates,
+            f=summary.total_fat,
+            fib=summary.total_fiber,
+        ),
+        advice.overall_assessment,
+    ]
+    if advice.strengths:
+        parts.append(_bullets("Strengths", advice.strengths))
+    if advice.areas_for_improvement:
+        parts.append(_bullets("Areas for improvement", advice.areas_for_improvement))
+    if advice.specific_recommendations:
+        parts.append(_bullets("Recommendations", advice.specific_recommendations))
+    parts.append(
+        _format_scores(
+            macro=advice.macro_balance_score, dist=advice.meal_distribution_score
+        )
+    )
+    return "\n\n".join(parts)
+
+
+# SQLite allows a single writer; serialize turn commits in-process instead of
+# letting worker threads contend on the database lock
+_WRITE_LOCK = asyncio.Lock()
+
+# One lock per active session so concurrent messages on the same session run
+# one turn at a time; entries disappear once no turn holds them
+_SESSION_LOCKS: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def _session_lock(session_id: str) -> asyncio.Lock:
+    lock = _SESSION_LOCKS.get(session_id)
+    if lock is None:
+        lock = _SESSION_LOCKS[session_id] = asyncio.Lock()
+    return lock
+
+
+@lru_cache(maxsize=1)
+def _get_food_search_agent():
+    """Shared search agent; it only holds configuration, so one per process"""
+    return create_food_search_agent()
+
 
 class MainWorkflow:
-    """Session-based Router/Dispatcher for Multi-Agent Food Tracking Workflow"""
+    """Session-based Router/Dispatcher for Multi-Agent Food Tracking Workflow
+
+    The session state is loaded once per turn in process_user_input and the
+    same SessionData is handed (positionally) through every handler; handlers must
+    never reload it from the repository mid-turn.
+    """
 
     def __init__(self, session_repo: SessionRepository):
         self.session_repo = session_repo
+        # Sessions whose state changed during the current turn
+        self._dirty: Dict[str, SessionData] = {}
 
-    def _get_session_state(self, session_id: str) -> Dict[str, Any]:
+    def _get_session_state(self, session_id: str) -> SessionData:
         """Get or create session state from database"""
         # Use repository method which already handles parsing
         return self.session_repo.get_or_create_session(session_id)
 
-    def _save_session_state(self, session_id: str, state: Dict[str, Any]):
+    def _save_session_state(self, session_id: str, state: SessionData):
         """Save session state to database"""
         self.session_repo.save_session_state(session_id, state)
 
+    def _mark_dirty(self, session_id: str, state: SessionData):
+        """Schedule session state to be saved once when the turn ends"""
+        self._dirty[session_id] = state
+
+    @asynccontextmanager
+    async def _turn_tx(self) -> AsyncIterator[None]:
+        """Coalesce every session save made during one user turn into one commit"""
+        self.session_repo.begin()
+        try:
+            yield
+            # Serialize each changed session once, in its final state
+            for session_id, state in self._dirty.items():
+                self._save_session_state(session_id, state)
+        except BaseException:
+            self.session_repo.rollback()
+            raise
+        finally:
+            self._dirty.clear()
+        # Single write for the whole turn, kept off the event loop
+        async with _WRITE_LOCK:
+            await asyncio.to_thread(self.session_repo.commit)
+
     async def process_user_input(
         self, user_message: str, session_id: str
     ) -> Dict[str, Any]:
         """Main entry point - routes to appropriate agent based on session state"""
-        # Get current session state
-        session_state = self._get_session_state(session_id)
-        current_state = session_state["current_state"]
-
-        # Route based on current state
-        if current_state == SessionState.INITIAL.value:
-            return await self._route_to_extractor(
-                session_id, session_state, user_message
-            )
-        elif current_state == SessionState.CLARIFYING.value:
-            return await self._handle_clarification(
-                session_id, session_state, user_message
-            )
-        elif current_state == SessionState.ADVISING.value:
-            return await self._route_to_search_agent(session_id, session_state)
-        elif current_state == SessionState.ADVISED.value:
-            return await self._handle_post_advice(
-                session_id, session_state, user_message
-            )
-        else:
-            return {"error": f"Unknown session state: {current_state}"}
+        async with _session_lock(session_id), self._turn_tx():
+            # Get current session state; a cache miss reads SQLite, so keep it
+            # off the event loop like the commit
+            session_state = await asyncio.to_thread(self._get_session_state, session_id)
+            # Nothing is written until the turn commits, so don't hold a pooled
+            # connection across the agent calls
+            self.session_repo.release()
+            current_state = session_state.current_state
+
+            # Route based on current state
+            handler = self._DISPATCH.get(current_state)
+            if handler is None:
+                return {"error": f"Unknown session state: {current_state}"}
+            return await handler(self, session_id, session_state, user_message)
 
     async def _route_to_extractor(
-        self, session_id: str, session_state: Dict, user_message: str
+        self, session_id: str, session_state: SessionData, user_message: str, /
     ) -> Dict[str, Any]:
         """Route to Food Extractor Agent"""
         try:
             # Call extractor agent
             extraction_result = await extract_foods_structured(user_message)
 
-            # Update session state with results
-            session_state["extracted_foods"] = [
-                food.model_dump() for food in extraction_result.foods
-            ]
-            session_state["user_message"] = user_message
-
-            # Check if clarification is needed
-            needs_clarification = []
-            for food in extraction_result.foods:
-                if hasattr(food, "needs_clarification") and food.needs_clarification:
-                    needs_clarification.append(food)
-
-            if needs_clarification:
-                # Transition to clarifying state
-                session_state["pending_clarifications"] = needs_clarification
-                session_state["current_state"] = SessionState.CLARIFYING.value
-                self._save_session_state(session_id, session_state)
+            # Update session state with results; one JSON-mode dump of the
+            # whole result instead of a Python-mode dump per food
+            session_state.extracted_foods = extraction_result.model_dump(
+                mode="json", include={"foods"}
+            )["foods"]
+            session_state.user_message = user_message
+
+            # Check if clarification is needed (the field always exists on
+            # ExtractedFood, defaulting to False); the pending list is only
+            # built when some food actually needs it
+            foods = extraction_result.foods
+            if any(food.needs_clarification for food in foods):
+                # Transition to clarifying state, keeping only the already
+                # dumped (JSON-safe) food dicts
+                pending = [
+                    dumped
+                    for dumped, food in zip(session_state.extracted_foods, foods)
+                    if food.needs_clarification
+                ]
+                pending_names = [
+                    food.get("local_name") or food.get("name", "") for food in pending
+                ]
+                session_state.pending_clarifications = pending
+                session_state.current_state = SessionState.CLARIFYING.value
+                self._mark_dirty(session_id, session_state)
 
                 return {
                     "status": "needs_clarification",
-                    "current_state": session_state["current_state"],
-                    "message": f"I found {len(extraction_result.foods)} food items, but need clarification on: {', '.join(needs_clarification)}",
-                    "clarifications_needed": needs_clarification,
-                    "extracted_foods": session_state["extracted_foods"],
+                    "current_state": session_state.current_state,
+                    "message": f"I found {len(foods)} food items, but need clarification on: {', '.join(pending_names)}",
+                    "clarifications_needed": pending,
+                    "extracted_foods": session_state.extracted_foods,
                 }
             else:
                 # Everything is clear, move to advising
-                session_state["current_state"] = SessionState.ADVISING.value
-                self._save_session_state(session_id, session_state)
+                session_state.current_state = SessionState.ADVISING.value
+                self._mark_dirty(session_id, session_state)
 
                 # Automatically route to search agent
                 return await self._route_to_search_agent(session_id, session_state)
@@ -99,61 +238,72 @@ class MainWorkflow:
             return {"error": f"Error in food extraction: {str(e)}"}
 
     async def _handle_clarification(
-        self, session_id: str, session_state: Dict, user_message: str
+        self, session_id: str, session_state: SessionData, user_message: str, /
     ) -> Dict[str, Any]:
         """Handle user clarification and route to next agent"""
 
-        session_state["clarification_responses"]["latest"] = user_message
+        session_state.clarification_responses["latest"] = user_message
 
         # Transition to advising state
-        session_state["current_state"] = SessionState.ADVISING.value
-        self._save_session_state(session_id, session_state)
+        session_state.current_state = SessionState.ADVISING.value
+        self._mark_dirty(session_id, session_state)
 
         # Route to search agent
         return await self._route_to_search_agent(session_id, session_state)
 
     async def _route_to_search_agent(
-        self, session_id: str, session_state: Dict
+        self,
+        session_id: str,
+        session_state: SessionData,
+        user_message: Optional[str] = None,
+        /,
     ) -> Dict[str, Any]:
-        """Route to Food Search Agent for nutrition analysis"""
+        """Route to Food Search Agent for nutrition analysis.
+
+        Also the dispatch handler for a turn left in advising state, which is
+        why it accepts (and ignores) the user message.
+        """
         try:
-            extracted_foods = session_state.get("extracted_foods", [])
+            extracted_foods = session_state.extracted_foods
 
             if not extracted_foods:
                 return {"error": "No foods found to analyze"}
 
-            # Prepare search payload
-            food_names = []
-            for food_data in extracted_foods:
-                food_names.append(
-                    FoodNames(
-                        normalized_eng_name=food_data.get("name", ""),
-                        normalized_id_name=food_data.get("local_name"),
-                        original_text=food_data.get("local_name")
-                        or food_data.get("name", ""),
-                    )
+            # Prepare search payload; the foods are dumps of the extractor's
+            # validated output, so construct it without re-validating
+            food_names = [
+                FoodNames.model_construct(
+                    normalized_eng_name=food_data.get("name", ""),
+                    normalized_id_name=food_data.get("local_name"),
+                    original_text=food_data.get("local_name")
+                    or food_data.get("name", ""),
                 )
-
-            search_payload = FoodSearchPayload(foods=food_names, notes=[])
+                for food_data in extracted_foods
+            ]
+            search_payload = FoodSearchPayload.model_construct(
+                foods=food_names, notes=[]
+            )
 
             # Create and call search agent with structured output
-            food_search_agent = create_food_search_agent()
+            food_search_agent = _get_food_search_agent()
             search_result = await food_search_agent.arun(
                 search_payload,
                 input_schema=FoodSearchPayload,
                 output_schema=FoodSearchResult,
             )
+            # Unwrap the structured data from RunOutput once for both checks
+            food_search_data = getattr(search_result, "content", None)
 
             # Check if everything is completed or needs more clarification
-            if self._is_search_complete(search_result):
+            if self._is_search_complete(food_search_data):
                 # Route to advisor agent
                 return await self._route_to_advisor(
-                    session_id, session_state, search_result
+                    session_id, session_state, food_search_data
                 )
             else:
                 # Need more clarification
-                session_state["current_state"] = SessionState.CLARIFYING.value
-                self._save_session_state(session_id, session_state)
+                session_state.current_state = SessionState.CLARIFYING.value
+                self._mark_dirty(session_id, session_state)
 
                 # Call food search agent to get more details
                 # result = await self.food_search_agent.arun(
@@ -161,70 +311,81 @@ class MainWorkflow:
                 # )
                 return {
                     "status": "needs_more_clarification",
-                    "current_state": session_state["current_state"],
+                    "current_state": session_state.current_state,
                     "message": "I need more details about some food items.",
-                    "search_results": search_result.content,
+                    "search_results": food_search_data,
                 }
 
         except Exception as e:
             return {"error": f"Error in food search: {str(e)}"}
 
     async def _route_to_advisor(
-        self, session_id: str, session_state: Dict, search_result
+        self,
+        session_id: str,
+        session_state: SessionData,
+        food_search_data: FoodSearchResult,
+        /,
     ) -> Dict[str, Any]:
         """Route to Advisor Agent for final recommendations"""
         try:
-            # Extract structured data from RunOutput
-            food_search_data: FoodSearchResult = (
-                search_result.content
-                if hasattr(search_result, "content")
-                else search_result
-            )
-
             # Convert FoodSearchResult to DailyMealData format
             meal_data = self._convert_to_daily_meal_data(food_search_data)
 
             # Call nutrition advisor with structured data
-            advice = analyze_daily_nutrition(meal_data)
+            advice = await analyze_daily_nutrition_async(meal_data)
 
-            # Update session state
-            session_state["advisor_recommendations"] = advice
-            session_state["current_state"] = SessionState.ADVISED.value
-            self._save_session_state(session_id, session_state)
+            # Update session state; a plain-text reply is kept as the text
+            session_state.advisor_recommendations = (
+                advice.model_dump(mode="json")
+                if isinstance(advice, DailyNutritionAnalysis)
+                else str(advice)
+            )
+            session_state.current_state = SessionState.ADVISED.value
+            self._mark_dirty(session_id, session_state)
 
             return {
                 "status": "advice_provided",
-                "current_state": session_state["current_state"],
-                "message": advice,
-                "foods_analyzed": session_state["extracted_foods"],
+                "current_state": session_state.current_state,
+                "message": _format_nutrition_analysis(advice),
+                "data": {"nutrition_analysis": session_state.advisor_recommendations}
+                if isinstance(advice, DailyNutritionAnalysis)
+                else {},
+                "foods_analyzed": session_state.extracted_foods,
             }
 
         except Exception as e:
             return {"error": f"Error generating advice: {str(e)}"}
 
     async def _handle_post_advice(
-        self, session_id: str, session_state: Dict, user_message: str
+        self, session_id: str, session_state: SessionData, user_message: str, /
     ) -> Dict[str, Any]:
         """Handle follow-up questions or new food tracking"""
         # Check if user wants to start new tracking
         if self._is_new_food_tracking(user_message):
-            # Reset session for new tracking
-            session_state["current_state"] = SessionState.INITIAL.value
-            session_state["extracted_foods"] = []
-            session_state["pending_clarifications"] = []
-            session_state["clarification_responses"] = {}
-            session_state["advisor_recommendations"] = None
+            # Reset session for new tracking; extracted_foods and user_message
+            # are overwritten by the extractor
+            session_state.current_state = SessionState.INITIAL.value
+            session_state.pending_clarifications = []
+            session_state.clarification_responses = {}
+            session_state.advisor_recommendations = None
 
             return await self._route_to_extractor(
                 session_id, session_state, user_message
             )
         else:
-            # Handle as follow-up question
+            # Handle as follow-up question; sessions saved before the advice
+            # column still carry their advice in the loaded state
+            previous_advice = (
+                session_state.advisor_recommendations
+                or await asyncio.to_thread(
+                    self.session_repo.get_advisor_recommendations, session_id
+                )
+            )
             return {
                 "status": "follow_up",
-                "current_state": session_state["current_state"],
+                "current_state": session_state.current_state,
                 "message": "I can help with follow-up questions or track new foods. What would you like to do?",
-                "previous_advice": session_state["advisor_recommendations"],
+                "previous_advice": previous_advice,
             }
 
     def _convert_to_daily_meal_data(
@@ -234,6 +395,8 @@ class MainWorkflow:
         meal_dict = {"Breakfast": [], "Lunch": [], "Dinner": [], "Snack": []}
 
         for food_item in search_result.foods:
+            portion_grams = food_item.portion_grams
+
             # Create FoodItem for the advisor
             food = FoodItem(
                 id=f"{food_item.name.lower().replace(' ', '_')}",
@@ -241,51 +404,40 @@ class MainWorkflow:
                 local_name=food_item.local_name,
                 category="other",  # Can be enhanced later
                 nutrition_per_100g=food_item.nutrition_per_100g,
-                standard_portions={"serving_size": food_item.portion_grams}
-                if food_item.portion_grams
+                standard_portions={"serving_size": portion_grams}
+                if portion_grams
                 else None,
             )
 
-            # Add to appropriate meal type
-            if food_item.meal_type:
-                meal_key = food_item.meal_type.value.capitalize()
-                if meal_key in meal_dict:
-                    meal_dict[meal_key].append(food)
-                else:
-                    meal_dict["Snack"].append(food)  # Default to snack if unknown
-            else:
-                meal_dict["Snack"].append(food)  # Default to snack if no meal type
+            # Add to appropriate meal type, defaulting to snack if unknown/missing
+            meal_dict[_MEAL_KEY.get(food_item.meal_type, "Snack")].append(food)
 
         return DailyMealData(**meal_dict)
 
-    def _is_search_complete(self, search_result) -> bool:
+    def _is_search_complete(self, search_data: Optional[FoodSearchResult]) -> bool:
         """Determine if search results are complete enough for advice"""
-        # Check if we have structured data
-        if hasattr(search_result, "content"):
-            search_data = search_result.content
-            if isinstance(search_data, FoodSearchResult):
-                # Complete if we have at least one food item
-                return len(search_data.foods) > 0
-        return False
+        # Complete if we have structured data with at least one food item
+        return isinstance(search_data, FoodSearchResult) and len(search_data.foods) > 0
 
     def _is_new_food_tracking(self, message: str) -> bool:
         """Determine if message is a new food tracking request"""
-        food_keywords = [
-            "makan",
-            "sarapan",
-            "lunch",
-            "dinner",
-            "snack",
-            "ate",
-            "eating",
-            "food",
-        ]
-        message_lower = message.lower()
-        return any(keyword in message_lower for keyword in food_keywords)
+        return _FOOD_KEYWORDS_RE.search(message) is not None
+
+    # State -> handler dispatch table, shared by all workflow instances
+    _DISPATCH = {
+        SessionState.INITIAL.value: _route_to_extractor,
+        SessionState.CLARIFYING.value: _handle_clarification,
+        SessionState.ADVISING.value: _route_to_search_agent,
+        SessionState.ADVISED.value: _handle_post_advice,
+    }
 
     def get_session_state(self, session_id: str) -> Dict[str, Any]:
         """Get current session state information"""
-        return self.session_repo.get_or_create_session(session_id)
+        return self.session_repo.get_or_create_session(session_id).model_dump()
+
+    def get_session_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get current state and timestamps, or None if the session is unknown"""
+        return self.session_repo.get_session_summary(session_id)
 
     def get_session_info(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session metadata and summary"""
@@ -309,7 +461,6 @@ DEFAULT_DB_RELATIVE = "agno.db"
 
 # Example usage and testing
 if __name__ == "__main__":
-    import asyncio
 
     async def test_workflow():
         sqlite_db = SQLiteDB(DEFAULT_DB_RELATIVE)
@@ -337,4 +488,12 @@ if __name__ == "__main__":
         info = workflow.get_session_info(session_id)
         print(info)
 
-    asyncio.run(test_workflow())
+    # Prefer uvloop's faster event loop when it is installed
+    try:
+        import uvloop
+
+        run = uvloop.run
+    except ImportError:
+        run = asyncio.run
+
+    run(test_workflow())